@@ -5,20 +5,37 @@ AttachmentStore implementation for handling file uploads.
 from __future__ import annotations
 
 import logging
-import uuid
 from typing import TYPE_CHECKING, Any
 
 from chatkit.store import AttachmentStore
 from chatkit.types import FileAttachment
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field
 
-from .config import get_public_url
+from .config import get_upload_url_template
 from .file_store import file_store
+from .ids import new_id
 
 if TYPE_CHECKING:
     from .memory_store import MemoryStore
 
 logger = logging.getLogger(__name__)
 
+_UPLOAD_URL_TMPL = get_upload_url_template()
+
+
+class UploadInput(BaseModel):
+    """Upload metadata (and optional inline data) accepted by create_attachment."""
+    model_config = ConfigDict(from_attributes=True)
+    name: str = Field(
+        default="unknown",
+        validation_alias=AliasChoices("name", "filename"),
+    )
+    mime_type: str = Field(
+        default="application/octet-stream",
+        validation_alias=AliasChoices("mime_type", "content_type"),
+    )
+    data: bytes | str | None = None
+
 
 class QuizAttachmentStore(AttachmentStore[dict[str, Any]]):
     """Attachment store for the quiz app."""
@@ -32,24 +49,20 @@ class QuizAttachmentStore(AttachmentStore[dict[str, Any]]):
         context: dict[str, Any],
     ) -> FileAttachment:
         """Create an attachment from uploaded file data."""
-        # Extract fields from input (could be dict or object)
-        if isinstance(input, dict):
-            filename = input.get("name", input.get("filename", "unknown"))
-            content_type = input.get("mime_type", input.get("content_type", "application/octet-stream"))
-            data = input.get("data")
-        else:
-            filename = getattr(input, "name", getattr(input, "filename", "unknown"))
-            content_type = getattr(input, "mime_type", getattr(input, "content_type", "application/octet-stream"))
-            data = getattr(input, "data", None)
+        # Input may be a dict or an object (e.g. AttachmentCreateParams)
+        upload = UploadInput.model_validate(input)
+        filename = upload.name
+        content_type = upload.mime_type
+        data = upload.data
         
-        logger.info(f"[AttachmentStore] Creating attachment: {filename}, type: {content_type}")
+        logger.info("[AttachmentStore] Creating attachment: %s, type: %s", filename, content_type)
         
         # Generate an ID for this attachment
-        attachment_id = str(uuid.uuid4())
+        attachment_id = new_id()
         
         # Store the file data if provided
         if data:
-            file_store.save(
+            await file_store.save(
                 filename=filename,
                 content_type=content_type,
                 data=data if isinstance(data, bytes) else data.encode(),
@@ -57,8 +70,7 @@ class QuizAttachmentStore(AttachmentStore[dict[str, Any]]):
         
         # Return FileAttachment with upload_url for two-phase upload
         # The client will PUT the file data to this URL
-        public_url = get_public_url()
-        upload_url = f"{public_url}/chatkit/uploads/{attachment_id}"
+        upload_url = _UPLOAD_URL_TMPL % attachment_id
         
         attachment = FileAttachment(
             id=attachment_id,
@@ -80,8 +92,8 @@ class QuizAttachmentStore(AttachmentStore[dict[str, Any]]):
         context: dict[str, Any],
     ) -> None:
         """Delete an attachment."""
-        logger.info(f"[AttachmentStore] Deleting attachment: {attachment_id}")
-        file_store.delete(attachment_id)
+        logger.info("[AttachmentStore] Deleting attachment: %s", attachment_id)
+        await file_store.delete(attachment_id)
 
     def generate_attachment_id(
         self,
@@ -89,5 +101,5 @@ class QuizAttachmentStore(AttachmentStore[dict[str, Any]]):
         context: dict[str, Any],
     ) -> str:
         """Generate a unique attachment ID."""
-        return str(uuid.uuid4())
+        return new_id()
 
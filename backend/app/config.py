@@ -19,26 +19,40 @@ def get_config():
         # Public URL for generating client-facing URLs (uploads, etc.)
         # Falls back to local URL if not set
         "public_url": os.getenv("PUBLIC_URL", f"http://{host}:{port}"),
+        # Upper bounds for the in-memory stores (LRU eviction past these)
+        "file_store_max_bytes": int(os.getenv("FILE_STORE_MAX_BYTES", str(256 * 1024 * 1024))),
+        "quiz_store_max": int(os.getenv("QUIZ_STORE_MAX", "1024")),
     }
 
 
+@lru_cache
 def get_backend_url() -> str:
     """Get the full backend URL (internal)."""
     config = get_config()
     return f"http://{config['backend_host']}:{config['backend_port']}"
 
 
+@lru_cache
 def get_public_url() -> str:
     """Get the public-facing URL for client requests."""
     return get_config()["public_url"]
 
 
+@lru_cache
+def get_upload_url_template() -> str:
+    """Get the %-style template for client upload URLs, keyed by upload ID."""
+    # Escape any percent-encoding in the public URL so it formats literally
+    return get_public_url().rstrip("/").replace("%", "%%") + "/chatkit/uploads/%s"
+
+
+@lru_cache
 def get_frontend_url() -> str:
     """Get the frontend URL."""
     return get_config()["frontend_url"]
 
 
-def get_cors_origins() -> list[str]:
+@lru_cache
+def get_cors_origins() -> tuple[str, ...]:
     """Get allowed CORS origins."""
     config = get_config()
     frontend = config["frontend_url"]
@@ -57,5 +71,5 @@ def get_cors_origins() -> list[str]:
     if additional:
         origins.extend([o.strip() for o in additional.split(",") if o.strip()])
     
-    return origins
+    return tuple(origins)
 
@@ -5,61 +5,293 @@ In production, use a proper storage service like S3.
 
 from __future__ import annotations
 
-import base64
+import asyncio
+import hashlib
+import io
 import logging
-import uuid
-from dataclasses import dataclass
-from typing import Any
+import os
+import tempfile
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, AsyncIterable, BinaryIO, Iterator
+
+import pybase64
+from cachetools import LRUCache
+
+from .config import get_config
+from .ids import new_id
 
 logger = logging.getLogger(__name__)
+logger.info("[FileStore] Using pybase64 %s", pybase64.get_version())
+
+# Streamed uploads larger than this are spilled to a temporary file on disk
+SPOOL_MAX_MEMORY = 1 << 20
+
+# Chunk size when base64-encoding; a multiple of 3 so the encoded chunks
+# concatenate without intermediate padding
+_B64_CHUNK_SIZE = 3 << 20
 
 
 @dataclass
 class StoredFile:
-    """A stored file with its metadata."""
+    """A stored file with its metadata.
+
+    The contents live either in ``data`` or, for large uploads, in a
+    temporary file at ``path``. Streamed uploads keep ``data`` as a
+    memoryview over their receive buffer rather than copying it to bytes.
+    """
     id: str
     filename: str
     content_type: str
-    data: bytes
+    data: bytes | bytearray | memoryview | None
     size: int
+    path: str | None = None
+    # Quoted strong ETag (sha256 of the contents), computed once on save
+    etag: str = ""
+    # Data URL encoded on first use; file data is immutable once saved
+    _cached_data_url: str | None = field(default=None, repr=False, compare=False)
+
+    def open(self) -> BinaryIO:
+        """Open the file contents for reading."""
+        if self.path is not None:
+            return open(self.path, "rb")
+        return io.BytesIO(self.data)
+
+    def read(self) -> bytes | bytearray | memoryview:
+        """Return the full file contents."""
+        if self.path is None:
+            return self.data
+        with self.open() as f:
+            return f.read()
+
+    def iter_chunks(self, chunk_size: int) -> Iterator[bytes | memoryview]:
+        """Yield the file contents in chunks, without copying in-memory data."""
+        if self.path is None:
+            view = memoryview(self.data)
+            for start in range(0, self.size, chunk_size):
+                yield view[start:start + chunk_size]
+        else:
+            with self.open() as f:
+                yield from iter(partial(f.read, chunk_size), b"")
+
+    def discard(self) -> None:
+        """Release the file contents, removing any spilled file from disk."""
+        self._cached_data_url = None
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+
+def _stored_size(stored: StoredFile) -> int:
+    """Bytes a stored file holds in memory, counting its cached data URL."""
+    return stored.size + len(stored._cached_data_url or "")
+
+
+def _encode_data_url(stored: StoredFile, prefix: bytes) -> str:
+    """Encode a file as a data URL with the given ``data:...;base64,`` prefix."""
+    # Encode straight into one preallocated buffer after the prefix,
+    # instead of building the base64 string and then concatenating
+    buf = bytearray(len(prefix) + (stored.size + 2) // 3 * 4)
+    buf[:len(prefix)] = prefix
+    pos = len(prefix)
+    for chunk in stored.iter_chunks(_B64_CHUNK_SIZE):
+        encoded = pybase64.b64encode(chunk)
+        buf[pos:pos + len(encoded)] = encoded
+        pos += len(encoded)
+    return buf.decode("latin-1")
+
+
+def _etag(hasher: Any) -> str:
+    """Format a finished content hash as a quoted ETag value."""
+    return f'"{hasher.hexdigest()}"'
+
+
+def _spill_chunks(spill: BinaryIO, hasher: Any, chunks: list[bytes | memoryview]) -> None:
+    """Write chunks to a spill file, adding them to the content hash."""
+    for chunk in chunks:
+        spill.write(chunk)
+        hasher.update(chunk)
+
+
+class _FileCache(LRUCache):
+    """LRU cache that discards evicted files."""
+
+    def popitem(self):
+        key, stored = super().popitem()
+        stored.discard()
+        return key, stored
 
 
 class FileStore:
-    """Simple in-memory file store."""
+    """Simple in-memory file store.
 
-    def __init__(self) -> None:
-        self._files: dict[str, StoredFile] = {}
+    Files are kept in an LRU cache bounded by total bytes, cached data URLs
+    included, so the least recently used files are evicted once
+    ``max_bytes`` is exceeded.
+    Mutations are serialized with an asyncio lock, so the API is async
+    and can later be backed by an async key-value store.
+    """
+
+    def __init__(self, max_bytes: int | None = None) -> None:
+        if max_bytes is None:
+            max_bytes = get_config()["file_store_max_bytes"]
+        self._files: LRUCache[str, StoredFile] = _FileCache(
+            maxsize=max_bytes,
+            getsizeof=_stored_size,
+        )
+        self._lock = asyncio.Lock()
 
-    def save(self, filename: str, content_type: str, data: bytes) -> str:
+    async def add(self, stored: StoredFile) -> None:
+        """Add a file under its own ID.
+
+        Raises ValueError if the file alone exceeds the store's byte budget.
+        """
+        async with self._lock:
+            previous = self._files.get(stored.id)
+            self._files[stored.id] = stored
+            if previous is not None and previous is not stored:
+                previous.discard()
+
+    async def save(self, filename: str, content_type: str, data: bytes) -> str:
         """Save a file and return its ID."""
-        file_id = str(uuid.uuid4())
-        self._files[file_id] = StoredFile(
+        file_id = new_id()
+        await self.add(StoredFile(
             id=file_id,
             filename=filename,
             content_type=content_type,
             data=data,
             size=len(data),
-        )
-        logger.info(f"[FileStore] Saved file {filename} ({len(data)} bytes) as {file_id}")
+            etag=_etag(hashlib.sha256(data)),
+        ))
+        logger.info("[FileStore] Saved file %s (%d bytes) as %s", filename, len(data), file_id)
         return file_id
 
-    def load(self, file_id: str) -> StoredFile | None:
+    async def save_stream(
+        self,
+        file_id: str,
+        filename: str,
+        content_type: str,
+        chunks: AsyncIterable[bytes],
+        size_hint: int = 0,
+    ) -> StoredFile:
+        """Save a streamed file under the given ID.
+
+        Small files are buffered in memory; once the stream grows past
+        SPOOL_MAX_MEMORY the rest is written to a temporary file instead.
+        Disk writes and hashing of spilled data run in a worker thread, in
+        batches of about SPOOL_MAX_MEMORY, so the event loop stays free.
+        ``size_hint`` (e.g. the Content-Length) preallocates the in-memory
+        buffer. Raises ValueError as soon as the stream exceeds the store's
+        byte budget, without reading the rest of it.
+        """
+        max_size = self._files.maxsize
+        buffer = bytearray(size_hint if 0 < size_hint <= SPOOL_MAX_MEMORY else 0)
+        spill = None
+        pending: list[bytes | memoryview] = []
+        pending_size = 0
+        size = 0
+        hasher = hashlib.sha256()
+        try:
+            async for chunk in chunks:
+                if size + len(chunk) > max_size:
+                    raise ValueError("file exceeds the store's byte budget")
+                if spill is None and size + len(chunk) > SPOOL_MAX_MEMORY:
+                    spill = await asyncio.to_thread(
+                        tempfile.NamedTemporaryFile, prefix="quiz-upload-", delete=False
+                    )
+                    pending.append(memoryview(buffer)[:size])
+                    pending_size = size
+                    buffer = bytearray()
+                if spill is None:
+                    # Slice assignment fills the preallocated buffer, and
+                    # extends it if the stream outgrows the hint
+                    buffer[size:size + len(chunk)] = chunk
+                else:
+                    pending.append(chunk)
+                    pending_size += len(chunk)
+                    if pending_size >= SPOOL_MAX_MEMORY:
+                        await asyncio.to_thread(_spill_chunks, spill, hasher, pending)
+                        pending = []
+                        pending_size = 0
+                size += len(chunk)
+            if spill is not None:
+                await asyncio.to_thread(_spill_chunks, spill, hasher, pending)
+                await asyncio.to_thread(spill.close)
+        except BaseException:
+            if spill is not None:
+                spill.close()
+                os.unlink(spill.name)
+            raise
+
+        if spill is None:
+            # At most SPOOL_MAX_MEMORY bytes, cheap enough to hash inline
+            hasher.update(memoryview(buffer)[:size])
+        stored = StoredFile(
+            id=file_id,
+            filename=filename,
+            content_type=content_type,
+            data=memoryview(buffer)[:size] if spill is None else None,
+            size=size,
+            path=spill.name if spill is not None else None,
+            etag=_etag(hasher),
+        )
+        try:
+            await self.add(stored)
+        except ValueError:
+            stored.discard()
+            raise
+        return stored
+
+    async def load(self, file_id: str) -> StoredFile | None:
         """Load a file by ID."""
         return self._files.get(file_id)
 
-    def delete(self, file_id: str) -> None:
+    async def delete(self, file_id: str) -> None:
         """Delete a file by ID."""
-        self._files.pop(file_id, None)
+        async with self._lock:
+            stored = self._files.pop(file_id, None)
+            if stored:
+                stored.discard()
 
-    def get_data_url(self, file_id: str) -> str | None:
-        """Get a data URL for the file (for passing to the model)."""
+    async def get_data_url(self, file_id: str, content_type: str | None = None) -> str | None:
+        """Get a data URL for the file (for passing to the model).
+
+        ``content_type`` overrides the stored content type in the URL.
+        """
         stored = self._files.get(file_id)
         if not stored:
             return None
-        b64 = base64.b64encode(stored.data).decode("utf-8")
-        return f"data:{stored.content_type};base64,{b64}"
+        prefix = f"data:{content_type or stored.content_type};base64,"
+        cached = stored._cached_data_url
+        if cached is None or not cached.startswith(prefix):
+            prefix = prefix.encode("latin-1")
+            if stored.path is None:
+                data_url = _encode_data_url(stored, prefix)
+            else:
+                # Reading and encoding a spilled file runs in a worker thread
+                try:
+                    data_url = await asyncio.to_thread(_encode_data_url, stored, prefix)
+                except FileNotFoundError:
+                    # Evicted or deleted while we were waiting to read it
+                    return None
+            async with self._lock:
+                if self._files.get(file_id) is stored:
+                    # Take the entry out (pop doesn't discard it) and add it
+                    # back with its URL, so the cache counts the URL against
+                    # its budget and evicts other files to make room
+                    self._files.pop(file_id)
+                    stored._cached_data_url = data_url
+                    try:
+                        self._files[file_id] = stored
+                    except ValueError:
+                        # File and URL together exceed the budget
+                        stored._cached_data_url = None
+                        self._files[file_id] = stored
+            return data_url
+        return cached
 
 
 # Global file store instance
 file_store = FileStore()
-
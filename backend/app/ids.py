@@ -0,0 +1,10 @@
+"""
+Opaque ID generation for uploads, files and attachments.
+"""
+
+import os
+
+
+def new_id() -> str:
+    """Return a random 128-bit ID as 32 hex characters."""
+    return os.urandom(16).hex()
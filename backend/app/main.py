@@ -3,26 +3,38 @@
 from __future__ import annotations
 
 import logging
-import uuid
+from urllib.parse import quote
 
+from cachetools import LRUCache
 from chatkit.server import StreamingResult
 from fastapi import Depends, FastAPI, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response, StreamingResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from starlette.responses import JSONResponse
 
-from .config import get_public_url, get_cors_origins
-from .file_store import file_store, StoredFile
+# Configure logging once, before the app modules below are imported, so
+# their import-time log lines are not dropped
+logging.basicConfig(level=logging.INFO)
+
+from .config import get_cors_origins, get_upload_url_template
+from .file_store import StoredFile, file_store
+from .ids import new_id
 from .server import QuizServer, create_quiz_server
 
 logger = logging.getLogger(__name__)
 
+_UPLOAD_URL_TMPL = get_upload_url_template()
+
+# Response headers for recently served files, keyed by file ID
+_file_headers: LRUCache[str, dict[str, str]] = LRUCache(maxsize=256)
+
 app = FastAPI(title="Quiz Taker API")
 
-# CORS - origins configured via environment variables
+# CORS - origins configured via environment variables. CORSMiddleware
+# checks each request's Origin with `in`, so a frozenset makes that O(1)
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=get_cors_origins(),
+    allow_origins=frozenset(get_cors_origins()),
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -72,13 +84,12 @@ async def initiate_upload(request: Request):
     content_type = body.get("content_type", "application/octet-stream")
     
     # Generate a temporary upload ID
-    upload_id = str(uuid.uuid4())
+    upload_id = new_id()
     
     # Return the URL where the file should be uploaded
-    public_url = get_public_url()
     return {
         "upload_id": upload_id,
-        "upload_url": f"{public_url}/chatkit/uploads/{upload_id}",
+        "upload_url": _UPLOAD_URL_TMPL % upload_id,
         "filename": filename,
         "content_type": content_type,
     }
@@ -88,23 +99,32 @@ async def _handle_file_upload(upload_id: str, request: Request):
     """Handle the actual file upload."""
     content_type = request.headers.get("content-type", "application/octet-stream")
     
-    # Read the file data
-    data = await request.body()
+    content_length = request.headers.get("content-length", "")
+    size_hint = int(content_length) if content_length.isdigit() else 0
     
-    # Store the file using the upload_id as the key
-    file_store._files[upload_id] = StoredFile(
-        id=upload_id,
-        filename=f"upload_{upload_id}",
-        content_type=content_type,
-        data=data,
-        size=len(data),
-    )
+    # Stream the file data into the store using the upload_id as the key;
+    # large uploads are spilled to disk rather than buffered in memory
+    try:
+        stored = await file_store.save_stream(
+            upload_id,
+            filename=f"upload_{upload_id}",
+            content_type=content_type,
+            chunks=request.stream(),
+            size_hint=size_hint,
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="File too large",
+        )
     
-    logger.info(f"[upload_file] Stored file {upload_id}: {len(data)} bytes, type: {content_type}")
+    logger.info(
+        "[upload_file] Stored file %s: %d bytes, type: %s", upload_id, stored.size, content_type
+    )
     
     return {
         "id": upload_id,
-        "size": len(data),
+        "size": stored.size,
         "content_type": content_type,
     }
 
@@ -121,16 +141,50 @@ async def upload_file_post(upload_id: str, request: Request):
     return await _handle_file_upload(upload_id, request)
 
 
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Check an If-None-Match header value against a file's ETag."""
+    if not if_none_match:
+        return False
+    return any(
+        tag.strip().removeprefix("W/") in (etag, "*")
+        for tag in if_none_match.split(",")
+    )
+
+
+def _get_file_headers(stored: StoredFile) -> dict[str, str]:
+    """Get the response headers for a file, reusing them across requests."""
+    headers = _file_headers.get(stored.id)
+    # A re-upload under the same ID changes the ETag
+    if headers is None or headers["ETag"] != stored.etag:
+        headers = {
+            "Content-Disposition": f'inline; filename="{quote(stored.filename)}"',
+            "ETag": stored.etag,
+            "Cache-Control": "private, max-age=3600",
+        }
+        _file_headers[stored.id] = headers
+    return headers
+
+
 @app.get("/chatkit/files/{file_id}")
-async def get_file(file_id: str):
+async def get_file(file_id: str, request: Request):
     """Get a file by ID."""
-    stored = file_store.load(file_id)
+    stored = await file_store.load(file_id)
     if not stored:
         raise HTTPException(status_code=404, detail="File not found")
     
+    headers = _get_file_headers(stored)
+    
+    # The client already has this exact file
+    if _etag_matches(request.headers.get("if-none-match"), stored.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    # Spilled uploads are served straight from disk
+    if stored.path is not None:
+        return FileResponse(stored.path, media_type=stored.content_type, headers=headers)
+    
     return Response(
-        content=stored.data,
+        content=stored.read(),
         media_type=stored.content_type,
-        headers={"Content-Disposition": f'inline; filename="{stored.filename}"'},
+        headers=headers,
     )
 
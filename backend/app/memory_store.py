@@ -101,8 +101,10 @@ class MemoryStore(Store[dict[str, Any]]):
         context: dict[str, Any],
     ) -> Page[ThreadItem]:
         items = [item.model_copy(deep=True) for item in self._items(thread_id)]
+        # Read the clock once for the fallback rather than once per item
+        now = datetime.utcnow()
         items.sort(
-            key=lambda item: getattr(item, "created_at", datetime.utcnow()),
+            key=lambda item: getattr(item, "created_at", now),
             reverse=(order == "desc"),
         )
 
@@ -16,21 +16,22 @@ from chatkit.types import (
 from pydantic import BaseModel, ConfigDict, Field
 
 from .memory_store import MemoryStore
-from .quiz_store import QuizStore
-from .widgets.quiz_widget import QuizState, build_quiz_widget
+from .quiz_store import QuizStore, StoredOption, StoredQuiz
+from .widgets.quiz_widget import build_pristine_quiz_widget
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 class QuizOption(BaseModel):
     """A single answer option for a quiz question."""
+    model_config = ConfigDict(defer_build=True, frozen=True)
     label: str = Field(description="The display text for this option")
     value: str = Field(description="The value/key for this option")
 
 
 class QuizQuestion(BaseModel):
     """A single quiz question with multiple choice options."""
+    model_config = ConfigDict(defer_build=True, frozen=True)
     id: str = Field(description="Unique identifier like q1, q2, q3")
     prompt: str = Field(description="The question text")
     options: list[QuizOption] = Field(description="The answer options")
@@ -66,42 +67,28 @@ async def show_quiz(
         title: The title of the quiz
         questions: List of QuizQuestion objects
     """
-    logger.info(f"[TOOL CALL] show_quiz: {title} with {len(questions)} questions")
+    logger.info("[TOOL CALL] show_quiz: %s with %d questions", title, len(questions))
     
-    # Build the questions data
-    questions_data = [
-        {
-            "id": q.id,
-            "prompt": q.prompt,
-            "options": [
-                {"label": o.label, "value": o.value, "disabled": False}
-                for o in q.options
-            ],
-            "correctValue": q.correctValue,
-            "hint": q.hint,
-            "explanation": q.explanation,
-            "userAnswer": "",
-            "isCorrect": False,
-        }
-        for q in questions
-    ]
-    
-    quiz_state = QuizState(
+    quiz = StoredQuiz(
         title=title,
-        submitted=False,
-        score=None,
-        questions=questions_data,
+        ids=tuple(q.id for q in questions),
+        prompts=tuple(q.prompt for q in questions),
+        options=tuple(
+            tuple(StoredOption(label=o.label, value=o.value) for o in q.options)
+            for q in questions
+        ),
+        correct_values=tuple(q.correctValue for q in questions),
+        hints=tuple(q.hint for q in questions),
+        explanations=tuple(q.explanation for q in questions),
     )
     
-    # Save the quiz state for later grading (keyed by thread ID)
+    # Save the quiz for later grading (keyed by thread ID)
     thread_id = ctx.context.thread.id
-    ctx.context.quiz_store.save(thread_id, {
-        "title": title,
-        "questions": questions_data,
-    })
-    logger.info(f"[show_quiz] Saved quiz state for thread {thread_id}")
+    await ctx.context.quiz_store.save(thread_id, quiz)
+    logger.info("[show_quiz] Saved quiz state for thread %s", thread_id)
     
-    widget = build_quiz_widget(quiz_state)
+    # Start from the fresh, unanswered state
+    widget = build_pristine_quiz_widget(quiz)
     
     # Stream the widget to the client
     await ctx.context.stream_widget(widget, copy_text=f"Quiz: {title}")
@@ -5,30 +5,76 @@ Maps widget IDs to quiz state so we can grade answers later.
 
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Any
+from dataclasses import dataclass
+
+from cachetools import LRUCache
+
+from .config import get_config
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass(slots=True, frozen=True)
+class StoredOption:
+    """An answer option of a stored quiz question."""
+    label: str
+    value: str
+
+
+@dataclass(slots=True, frozen=True)
+class StoredQuiz:
+    """
+    A quiz as created by the agent.
+
+    Questions are stored column-wise: the i-th entry of each tuple belongs
+    to the i-th question, so grading can compare ``correct_values`` against
+    the answers in a single pass.
+    """
+    title: str
+    ids: tuple[str, ...]
+    prompts: tuple[str, ...]
+    options: tuple[tuple[StoredOption, ...], ...]
+    correct_values: tuple[str, ...]
+    hints: tuple[str, ...]
+    explanations: tuple[str, ...]
+
+
 class QuizStore:
-    """Store quiz state by widget ID for later grading."""
+    """Store quiz state by widget ID for later grading.
 
-    def __init__(self) -> None:
-        self._quizzes: dict[str, dict[str, Any]] = {}
+    Holds at most ``max_quizzes`` entries, evicting the least recently used.
+    Mutations are serialized with an asyncio lock, so the API is async.
+    """
 
-    def save(self, widget_id: str, quiz_data: dict[str, Any]) -> None:
+    def __init__(self, max_quizzes: int | None = None) -> None:
+        if max_quizzes is None:
+            max_quizzes = get_config()["quiz_store_max"]
+        self._quizzes: LRUCache[str, StoredQuiz] = LRUCache(maxsize=max_quizzes)
+        self._lock = asyncio.Lock()
+
+    async def save(self, widget_id: str, quiz: StoredQuiz) -> None:
         """Save quiz state for a widget."""
-        logger.info(f"[QuizStore] Saving quiz for widget {widget_id}")
-        self._quizzes[widget_id] = quiz_data
+        logger.info("[QuizStore] Saving quiz for widget %s", widget_id)
+        async with self._lock:
+            self._quizzes[widget_id] = quiz
+
+    async def load(self, widget_id: str) -> StoredQuiz | None:
+        """Load quiz state for a widget.
 
-    def load(self, widget_id: str) -> dict[str, Any] | None:
-        """Load quiz state for a widget."""
+        Returns the stored object itself rather than a copy. StoredQuiz is
+        frozen and built from tuples, so callers can share it freely; to
+        change a quiz, build a new StoredQuiz and ``save`` it.
+        """
         data = self._quizzes.get(widget_id)
-        logger.info(f"[QuizStore] Loading quiz for widget {widget_id}: {'found' if data else 'not found'}")
+        logger.info(
+            "[QuizStore] Loading quiz for widget %s: %s", widget_id, "found" if data else "not found"
+        )
         return data
 
-    def delete(self, widget_id: str) -> None:
+    async def delete(self, widget_id: str) -> None:
         """Delete quiz state for a widget."""
-        self._quizzes.pop(widget_id, None)
+        async with self._lock:
+            self._quizzes.pop(widget_id, None)
 
@@ -5,9 +5,10 @@ Handles quiz generation via the agent and quiz.submit/quiz.reset actions.
 
 from __future__ import annotations
 
+import asyncio
 import logging
 from datetime import datetime
-from typing import Any, AsyncIterator
+from typing import Any, AsyncIterator, TypeVar
 
 from agents import Runner
 from chatkit.agents import stream_agent_response
@@ -32,11 +33,62 @@ from .memory_store import MemoryStore
 from .quiz_agent import QuizAgentContext, quiz_agent
 from .quiz_store import QuizStore
 from .thread_item_converter import BasicThreadItemConverter
-from .widgets.quiz_widget import QuizState, build_quiz_widget, grade_quiz, reset_quiz
+from .widgets.quiz_widget import build_pristine_quiz_widget, build_quiz_widget, grade_quiz
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+_END = object()
+
+# Score messages as (minimum fraction correct, template), highest band first
+_MSG_BANDS = (
+    (1.0, "🎉 Perfect score! You got all {total} questions correct!"),
+    (0.7, "Great job! You scored {correct}/{total}. Keep it up!"),
+    (0.5, "Not bad! You scored {correct}/{total}. Review the hints for the ones you missed."),
+    (0.0, "You scored {correct}/{total}. Check the hints and try again!"),
+)
+
+
+async def _prefetch(source: AsyncIterator[T], size: int = 2) -> AsyncIterator[T]:
+    """
+    Iterate ``source`` in a background task, buffering up to ``size`` items
+    so the producer can run ahead while the consumer is still sending the
+    previous one. Errors from ``source`` are re-raised to the consumer.
+    """
+    # The queue itself is unbounded so the end marker can always be queued
+    # without waiting; the semaphore bounds how far the producer runs ahead
+    queue: asyncio.Queue[tuple[Any, BaseException | None]] = asyncio.Queue()
+    slots = asyncio.Semaphore(size)
+
+    async def produce() -> None:
+        error: BaseException | None = None
+        try:
+            async for item in source:
+                await slots.acquire()
+                queue.put_nowait((item, None))
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            # Always wake the consumer, even if the source ended with a
+            # BaseException such as CancelledError
+            queue.put_nowait((_END, error))
+
+    task = asyncio.create_task(produce())
+    try:
+        while True:
+            item, exc = await queue.get()
+            if item is _END:
+                if exc is not None:
+                    raise exc
+                return
+            slots.release()
+            yield item
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
 
 class QuizServer(ChatKitServer[dict[str, Any]]):
     """ChatKit server for the Quiz Taker app."""
@@ -47,6 +99,11 @@ class QuizServer(ChatKitServer[dict[str, Any]]):
         super().__init__(self.store, attachment_store=self.attachment_store)
         self.thread_item_converter = BasicThreadItemConverter()
         self.quiz_store = QuizStore()
+        # Widget action handlers by action type; all take the same arguments
+        self._action_handlers = {
+            "quiz.submit": self._handle_quiz_submit,
+            "quiz.reset": self._handle_quiz_reset,
+        }
 
     async def action(
         self,
@@ -57,19 +114,15 @@ class QuizServer(ChatKitServer[dict[str, Any]]):
     ) -> AsyncIterator[ThreadStreamEvent]:
         """Handle widget actions like quiz.submit and quiz.reset."""
         
-        logger.info(f"Received action: {action.type} with payload: {action.payload}")
+        logger.info("Received action: %s with payload: %s", action.type, action.payload)
         
-        if action.type == "quiz.submit":
-            async for event in self._handle_quiz_submit(thread, action.payload, sender, context):
-                yield event
+        handler = self._action_handlers.get(action.type)
+        if handler is None:
+            logger.warning("Unknown action type: %s", action.type)
             return
         
-        if action.type == "quiz.reset":
-            async for event in self._handle_quiz_reset(thread, sender, context):
-                yield event
-            return
-        
-        logger.warning(f"Unknown action type: {action.type}")
+        async for event in handler(thread, action.payload, sender, context):
+            yield event
 
     async def respond(
         self,
@@ -94,7 +147,9 @@ class QuizServer(ChatKitServer[dict[str, Any]]):
             order="desc",
             context=context,
         )
-        items = list(reversed(items_page.data))
+        # The page only holds copies, so put them in chronological order in place
+        items = items_page.data
+        items.reverse()
 
         # Convert to agent input format
         input_items = await self.thread_item_converter.to_agent_input(items)
@@ -106,7 +161,7 @@ class QuizServer(ChatKitServer[dict[str, Any]]):
             context=agent_context,
         )
 
-        async for event in stream_agent_response(agent_context, result):
+        async for event in _prefetch(stream_agent_response(agent_context, result)):
             yield event
 
     def get_stream_options(self, thread: ThreadMetadata, context: dict[str, Any]) -> StreamOptions:
@@ -116,11 +171,15 @@ class QuizServer(ChatKitServer[dict[str, Any]]):
         """Convert an attachment to model input content."""
         from .file_store import file_store
         
-        logger.info(f"[to_message_content] Processing attachment: {attachment.filename}, type: {attachment.content_type}")
+        logger.info(
+            "[to_message_content] Processing attachment: %s, type: %s",
+            attachment.filename,
+            attachment.content_type,
+        )
         
         # Try to get the file data URL for the model
         if hasattr(attachment, 'id') and attachment.id:
-            data_url = file_store.get_data_url(attachment.id)
+            data_url = await file_store.get_data_url(attachment.id)
             if data_url and attachment.content_type:
                 # For PDFs and images, we can pass them directly
                 if attachment.content_type.startswith("image/"):
@@ -149,29 +208,25 @@ class QuizServer(ChatKitServer[dict[str, Any]]):
             logger.warning("quiz.submit received without sender widget")
             return
         
-        logger.info(f"Payload (answers): {payload}")
+        logger.info("Payload (answers): %s", payload)
         
         # Load quiz state from the quiz store
-        quiz_data = self.quiz_store.load(thread.id)
+        quiz = await self.quiz_store.load(thread.id)
         
-        if not quiz_data:
-            logger.error(f"Could not find quiz state for thread {thread.id}")
+        if not quiz:
+            logger.error("Could not find quiz state for thread %s", thread.id)
             return
         
-        logger.info(f"Loaded quiz data: {quiz_data}")
-        
-        current_state = QuizState(
-            title=quiz_data["title"],
-            submitted=False,
-            score=None,
-            questions=quiz_data["questions"],
-        )
+        logger.info("Loaded quiz: %s", quiz.title)
         
-        # The payload has answers nested: {"answers": {"q1": "value", ...}}
-        answers = payload.get("answers", payload)
+        # The payload has answers nested: {"answers": {"q1": "value", ...}}.
+        # Normalize flat form keys like {"answers.q1": "value"} once here.
+        answers = payload.get("answers")
+        if not isinstance(answers, dict):
+            answers = {key.removeprefix("answers."): value for key, value in payload.items()}
         
         # Grade the quiz
-        graded_state = grade_quiz(current_state, answers)
+        graded_state, correct, total = grade_quiz(quiz, answers)
         
         # Build updated widget
         updated_widget = build_quiz_widget(graded_state)
@@ -182,17 +237,8 @@ class QuizServer(ChatKitServer[dict[str, Any]]):
         )
         
         # Send a congratulatory message
-        correct = sum(1 for q in graded_state.questions if q["isCorrect"])
-        total = len(graded_state.questions)
-        
-        if correct == total:
-            message = f"🎉 Perfect score! You got all {total} questions correct!"
-        elif correct >= total * 0.7:
-            message = f"Great job! You scored {correct}/{total}. Keep it up!"
-        elif correct >= total * 0.5:
-            message = f"Not bad! You scored {correct}/{total}. Review the hints for the ones you missed."
-        else:
-            message = f"You scored {correct}/{total}. Check the hints and try again!"
+        template = next(t for threshold, t in _MSG_BANDS if correct >= total * threshold)
+        message = template.format(correct=correct, total=total)
         
         message_item = AssistantMessageItem(
             id=self.store.generate_item_id("message", thread, context),
@@ -205,6 +251,7 @@ class QuizServer(ChatKitServer[dict[str, Any]]):
     async def _handle_quiz_reset(
         self,
         thread: ThreadMetadata,
+        payload: dict[str, Any],
         sender: WidgetItem | None,
         context: dict[str, Any],
     ) -> AsyncIterator[ThreadStreamEvent]:
@@ -215,24 +262,14 @@ class QuizServer(ChatKitServer[dict[str, Any]]):
             return
         
         # Load quiz state from the quiz store
-        quiz_data = self.quiz_store.load(thread.id)
+        quiz = await self.quiz_store.load(thread.id)
         
-        if not quiz_data:
-            logger.error(f"Could not find quiz state for thread {thread.id}")
+        if not quiz:
+            logger.error("Could not find quiz state for thread %s", thread.id)
             return
         
-        current_state = QuizState(
-            title=quiz_data["title"],
-            submitted=True,  # It was submitted, now we're resetting
-            score=None,
-            questions=quiz_data["questions"],
-        )
-        
-        # Reset the quiz
-        reset_state = reset_quiz(current_state)
-        
-        # Build updated widget
-        updated_widget = build_quiz_widget(reset_state)
+        # The reset widget is the quiz's fresh state, built once per quiz
+        updated_widget = build_pristine_quiz_widget(quiz)
         
         # Replace the widget with the reset version
         yield ThreadItemReplacedEvent(
@@ -247,43 +284,6 @@ class QuizServer(ChatKitServer[dict[str, Any]]):
         )
         yield ThreadItemDoneEvent(item=message_item)
 
-    def _extract_quiz_state(self, widget_item: WidgetItem) -> QuizState | None:
-        """Extract QuizState from a widget item."""
-        try:
-            # The widget contains the rendered template, but we stored the data
-            # We need to get it from the widget's data attribute
-            widget = widget_item.widget
-            
-            logger.info(f"[_extract_quiz_state] Widget type: {type(widget)}")
-            logger.info(f"[_extract_quiz_state] Widget attrs: {dir(widget)}")
-            
-            # WidgetRoot has a 'data' attribute with the template variables
-            if hasattr(widget, "data"):
-                data = widget.data
-                logger.info(f"[_extract_quiz_state] Got data from .data attr: {type(data)}")
-            elif hasattr(widget, "model_dump"):
-                dumped = widget.model_dump()
-                logger.info(f"[_extract_quiz_state] Dumped widget: {dumped}")
-                data = dumped.get("data", dumped)
-            elif isinstance(widget, dict):
-                data = widget.get("data", widget)
-            else:
-                logger.error(f"Unknown widget format: {type(widget)}")
-                return None
-            
-            logger.info(f"[_extract_quiz_state] Extracted data: {data}")
-            logger.info(f"[_extract_quiz_state] Questions: {data.get('questions', [])}")
-            
-            return QuizState(
-                title=data.get("title", "Quiz"),
-                submitted=data.get("submitted", False),
-                score=data.get("score"),
-                questions=data.get("questions", []),
-            )
-        except Exception as e:
-            logger.exception(f"Error extracting quiz state: {e}")
-            return None
-
 
 def create_quiz_server() -> QuizServer:
     """Create and return a configured quiz server."""
@@ -3,20 +3,81 @@
 from __future__ import annotations
 
 import logging
-from typing import Any
+from functools import cache
+from pathlib import Path
+from typing import Any, Sequence
 
+from agents import TResponseInputItem
+from cachetools import LRUCache, TTLCache
 from chatkit.agents import ThreadItemConverter
-from chatkit.types import FileAttachment, HiddenContextItem, ImageAttachment
+from chatkit.types import FileAttachment, HiddenContextItem, ImageAttachment, ThreadItem
+from openai import AsyncOpenAI, OpenAIError
 from openai.types.responses import ResponseInputTextParam
 from openai.types.responses.response_input_item_param import Message
 
-from .file_store import file_store
+from .file_store import StoredFile, file_store
 
 logger = logging.getLogger(__name__)
 
+# PDFs larger than this are uploaded through the Files API once and sent by
+# file ID, rather than inline as a base64 data URL on every turn
+FILE_UPLOAD_THRESHOLD = 1 << 20
+
+# Uploaded files expire on the OpenAI side after this long (the API maximum);
+# their IDs are cached for a day less, so a cached ID is never stale
+_UPLOAD_EXPIRES_SECONDS = 30 * 24 * 60 * 60
+_UPLOAD_ID_TTL = _UPLOAD_EXPIRES_SECONDS - 24 * 60 * 60
+
+
+@cache
+def _openai_client() -> AsyncOpenAI:
+    """Create the client for file uploads on first use."""
+    return AsyncOpenAI()
+
 
 class BasicThreadItemConverter(ThreadItemConverter):
-    """Adds HiddenContextItem and Attachment support."""
+    """Adds HiddenContextItem and Attachment support.
+
+    Conversions are memoized per thread item, so re-sending a thread's
+    recent history on every turn only converts items that are new or
+    have changed since they were last seen. Items with attachments are
+    converted afresh each time: their content comes from the file store
+    and the upload cache, which evict and expire on their own terms.
+    """
+
+    def __init__(self, max_cached_items: int = 256) -> None:
+        self._converted: LRUCache[str, tuple[ThreadItem, bool, list[TResponseInputItem]]] = LRUCache(
+            maxsize=max_cached_items
+        )
+        # Files API IDs of uploaded attachments, by attachment ID
+        self._uploaded_file_ids: TTLCache[str, str] = TTLCache(
+            maxsize=max_cached_items, ttl=_UPLOAD_ID_TTL
+        )
+
+    async def to_agent_input(
+        self,
+        thread_items: Sequence[ThreadItem] | ThreadItem,
+    ) -> list[TResponseInputItem]:
+        if isinstance(thread_items, Sequence):
+            thread_items = thread_items[:]
+        else:
+            thread_items = [thread_items]
+        output: list[TResponseInputItem] = []
+        for item in thread_items:
+            is_last_message = item is thread_items[-1]
+            cached = self._converted.get(item.id)
+            # Items can be replaced in place (e.g. a graded quiz widget),
+            # so a hit must match the item itself, not just its ID
+            if cached is not None and cached[1] == is_last_message and cached[0] == item:
+                converted = cached[2]
+            else:
+                converted = await self._thread_item_to_input_item(
+                    item, is_last_message=is_last_message
+                )
+                if not getattr(item, "attachments", None):
+                    self._converted[item.id] = (item, is_last_message, converted)
+            output.extend(converted)
+        return output
 
     async def hidden_context_to_input(self, item: HiddenContextItem):
         return Message(
@@ -30,28 +91,81 @@ class BasicThreadItemConverter(ThreadItemConverter):
             role="user",
         )
 
+    async def _upload_file(
+        self,
+        attachment: FileAttachment | ImageAttachment,
+        stored_file: StoredFile,
+    ) -> str | None:
+        """Upload an attachment through the Files API once and return its file ID.
+
+        Returns None if the upload fails, so the caller can send it inline.
+        """
+        file_id = self._uploaded_file_ids.get(attachment.id)
+        if file_id is not None:
+            return file_id
+        if stored_file.path is not None:
+            # The client reads files on disk without blocking the event loop
+            content: Path | bytes = Path(stored_file.path)
+        else:
+            content = bytes(stored_file.data)
+        try:
+            uploaded = await _openai_client().files.create(
+                file=(attachment.name, content, attachment.mime_type),
+                purpose="user_data",
+                expires_after={"anchor": "created_at", "seconds": _UPLOAD_EXPIRES_SECONDS},
+            )
+        except (OpenAIError, OSError):
+            # OSError covers a spilled file evicted before the client read it
+            logger.exception(
+                "[attachment_to_message_content] Upload failed for %s, sending inline",
+                attachment.id,
+            )
+            return None
+        logger.info(
+            "[attachment_to_message_content] Uploaded %s (%d bytes) as %s",
+            attachment.name,
+            stored_file.size,
+            uploaded.id,
+        )
+        self._uploaded_file_ids[attachment.id] = uploaded.id
+        return uploaded.id
+
     async def attachment_to_message_content(
         self, 
         attachment: FileAttachment | ImageAttachment,
     ) -> dict[str, Any] | None:
         """Convert an attachment to message content for the model."""
-        logger.info(f"[attachment_to_message_content] Processing: {attachment.name}, type: {attachment.mime_type}")
+        logger.info(
+            "[attachment_to_message_content] Processing: %s, type: %s",
+            attachment.name,
+            attachment.mime_type,
+        )
         
         # Try to get the file data from our store
-        stored_file = file_store.load(attachment.id)
+        stored_file = await file_store.load(attachment.id)
         
-        if stored_file and stored_file.data:
-            # For PDFs - include the content as base64 for the model
+        if stored_file and stored_file.size:
+            if attachment.mime_type == "application/pdf" and stored_file.size > FILE_UPLOAD_THRESHOLD:
+                file_id = await self._upload_file(attachment, stored_file)
+                if file_id:
+                    return {
+                        "type": "input_file",
+                        "file_id": file_id,
+                        "filename": attachment.name,
+                    }
+            
+            # For PDFs - include the content as base64 for the model. The
+            # file store encodes it once and reuses the data URL after that.
             if attachment.mime_type == "application/pdf":
-                import base64
-                b64_data = base64.b64encode(stored_file.data).decode("utf-8")
+                data_url = await file_store.get_data_url(attachment.id, attachment.mime_type)
                 
                 # GPT-4o can handle files via the file input type
-                return {
-                    "type": "input_file",
-                    "file_data": f"data:{attachment.mime_type};base64,{b64_data}",
-                    "filename": attachment.name,
-                }
+                if data_url:
+                    return {
+                        "type": "input_file",
+                        "file_data": data_url,
+                        "filename": attachment.name,
+                    }
         
         # Fallback: just describe the attachment
         return {
@@ -4,16 +4,27 @@ Quiz widget builder - creates the Quiz Taker widget with proper state.
 
 from __future__ import annotations
 
+import json
 import os
+import re
 from dataclasses import dataclass, field
+from functools import cache, lru_cache
 from typing import Any
 
-from chatkit.widgets import WidgetRoot, WidgetTemplate
+from cachetools import LRUCache
+from chatkit.widgets import DynamicWidgetRoot, WidgetRoot, WidgetTemplate
+
+from ..quiz_store import StoredQuiz
 
 # Load the widget template using absolute path
 _widget_dir = os.path.dirname(os.path.abspath(__file__))
 _widget_path = os.path.join(_widget_dir, "quiz_taker.widget")
-quiz_widget_template = WidgetTemplate.from_file(_widget_path)
+
+
+@cache
+def _template() -> WidgetTemplate:
+    """Load and parse the widget template on first use."""
+    return WidgetTemplate.from_file(_widget_path)
 
 
 @dataclass
@@ -25,16 +36,102 @@ class QuizState:
     questions: list[dict[str, Any]] = field(default_factory=list)
 
 
+# Text fields are rendered into a cached skeleton as @@name@@ slots
+_SLOT_RE = re.compile(r"@@([\w.]+)@@")
+
+# Built widgets keyed by everything that goes into them, so repeat renders
+# of the same state (e.g. resetting back to a fresh quiz) skip the build.
+# Widgets are shared between callers and must be treated as read-only.
+_widget_cache: LRUCache[tuple[Any, ...], WidgetRoot] = LRUCache(maxsize=128)
+
+
+def _slot(name: str) -> str:
+    return f"@@{name}@@"
+
+
+@lru_cache(maxsize=128)
+def _widget_skeleton(
+    submitted: bool,
+    shape: tuple[tuple[bool, tuple[bool | None, ...]], ...],
+) -> str:
+    """
+    Render the widget template once for a given quiz shape.
+
+    The template's structure only depends on ``submitted``, each question's
+    ``isCorrect`` and each option's ``disabled`` flag; every text field is
+    left as a slot for ``build_quiz_widget`` to fill in.
+    """
+    questions = []
+    for i, (is_correct, disabled_flags) in enumerate(shape):
+        options = []
+        for j, disabled in enumerate(disabled_flags):
+            option: dict[str, Any] = {
+                "label": _slot(f"q{i}.o{j}.label"),
+                "value": _slot(f"q{i}.o{j}.value"),
+            }
+            if disabled is not None:
+                option["disabled"] = disabled
+            options.append(option)
+        questions.append({
+            "id": _slot(f"q{i}.id"),
+            "prompt": _slot(f"q{i}.prompt"),
+            "options": options,
+            "userAnswer": _slot(f"q{i}.userAnswer"),
+            "isCorrect": is_correct,
+            "hint": _slot(f"q{i}.hint"),
+            "explanation": _slot(f"q{i}.explanation"),
+        })
+    return _template().template.render(
+        title=_slot("title"),
+        submitted=submitted,
+        score=_slot("score"),
+        questions=questions,
+    )
+
+
 def build_quiz_widget(state: QuizState) -> WidgetRoot:
-    """Build a quiz widget from the given state."""
-    return quiz_widget_template.build(
-        data={
+    """Build a quiz widget from the given state (memoized, treat as read-only)."""
+    shape = tuple(
+        (
+            state.submitted and bool(q.get("isCorrect")),
+            tuple(o.get("disabled") for o in q["options"]),
+        )
+        for q in state.questions
+    )
+    values = {"title": state.title, "score": state.score or ""}
+    for i, q in enumerate(state.questions):
+        values[f"q{i}.id"] = q["id"]
+        values[f"q{i}.prompt"] = q["prompt"]
+        values[f"q{i}.userAnswer"] = q.get("userAnswer", "")
+        values[f"q{i}.hint"] = q["hint"]
+        values[f"q{i}.explanation"] = q["explanation"]
+        for j, o in enumerate(q["options"]):
+            values[f"q{i}.o{j}.label"] = o["label"]
+            values[f"q{i}.o{j}.value"] = o["value"]
+    
+    if not all(type(value) is str for value in values.values()):
+        # A slot can only hold text, so anything else (e.g. a non-string
+        # answer from the client) renders through the template as is. It
+        # also bypasses the cache: it may be unhashable, and True == 1
+        # would share a key with an answer of 1.
+        return _template().build(data={
             "title": state.title,
             "submitted": state.submitted,
             "score": state.score or "",
             "questions": state.questions,
-        }
-    )
+        })
+    
+    key = (state.submitted, shape, tuple(values.values()))
+    widget = _widget_cache.get(key)
+    if widget is None:
+        # Slots sit inside JSON strings, so fill them with JSON-escaped text
+        rendered = _SLOT_RE.sub(
+            lambda m: json.dumps(values[m.group(1)])[1:-1],
+            _widget_skeleton(state.submitted, shape),
+        )
+        widget = DynamicWidgetRoot.model_validate(json.loads(rendered))
+        _widget_cache[key] = widget
+    return widget
 
 
 import logging
@@ -42,72 +139,105 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-def grade_quiz(state: QuizState, answers: dict[str, str]) -> QuizState:
+def _questions_data(
+    quiz: StoredQuiz,
+    user_answers: list[str],
+    correct_flags: list[bool],
+    submitted: bool,
+) -> list[dict[str, Any]]:
+    """Materialize the per-question dicts the widget template expects."""
+    return [
+        {
+            "id": qid,
+            "prompt": prompt,
+            # Options are disabled once the quiz has been submitted
+            "options": [
+                {"label": opt.label, "value": opt.value, "disabled": submitted}
+                for opt in options
+            ],
+            "correctValue": correct_value,
+            "hint": hint,
+            "explanation": explanation,
+            "userAnswer": user_answer,
+            "isCorrect": is_correct,
+        }
+        for qid, prompt, options, correct_value, hint, explanation, user_answer, is_correct in zip(
+            quiz.ids,
+            quiz.prompts,
+            quiz.options,
+            quiz.correct_values,
+            quiz.hints,
+            quiz.explanations,
+            user_answers,
+            correct_flags,
+        )
+    ]
+
+
+def grade_quiz(quiz: StoredQuiz, answers: dict[str, str]) -> tuple[QuizState, int, int]:
     """
-    Grade the quiz and return updated state.
+    Grade the quiz and return the submitted state.
     
     Args:
-        state: Current quiz state
+        quiz: The stored quiz
         answers: Dict mapping question IDs to user answers (e.g. {"q1": "paris", "q2": "4"})
     
     Returns:
-        Updated QuizState with grading results
+        Tuple of (QuizState with grading results, correct count, total questions)
     """
-    logger.info(f"[grade_quiz] Answers received: {answers}")
-    logger.info(f"[grade_quiz] Questions in state: {len(state.questions)}")
+    logger.info("[grade_quiz] Answers received: %s", answers)
+    logger.info("[grade_quiz] Questions in quiz: %d", len(quiz.ids))
     
-    correct_count = 0
-    total_count = len(state.questions)
+    user_answers = [answers.get(qid, "") for qid in quiz.ids]
+    correct_flags = [u == c for u, c in zip(user_answers, quiz.correct_values)]
+    correct_count = sum(correct_flags)
+    total = len(quiz.ids)
     
-    graded_questions = []
-    for q in state.questions:
-        qid = q["id"]
-        correct_value = q["correctValue"]
-        
-        # Try different answer key formats
-        user_answer = answers.get(qid, answers.get(f"answers.{qid}", ""))
-        is_correct = user_answer == correct_value
-        
-        logger.info(f"[grade_quiz] Q {qid}: user='{user_answer}' correct='{correct_value}' match={is_correct}")
-        
-        if is_correct:
-            correct_count += 1
-        
-        graded_questions.append({
-            **q,
-            "userAnswer": user_answer,
-            "isCorrect": is_correct,
-            # Disable options after submission
-            "options": [
-                {**opt, "disabled": True} for opt in q["options"]
-            ],
-        })
+    # Skip the per-question loop entirely when INFO is filtered out
+    if logger.isEnabledFor(logging.INFO):
+        for qid, user_answer, correct_value, is_correct in zip(
+            quiz.ids, user_answers, quiz.correct_values, correct_flags
+        ):
+            logger.info(
+                "[grade_quiz] Q %s: user=%r correct=%r match=%s",
+                qid, user_answer, correct_value, is_correct,
+            )
     
-    return QuizState(
-        title=state.title,
+    state = QuizState(
+        title=quiz.title,
         submitted=True,
-        score=f"{correct_count}/{total_count}",
-        questions=graded_questions,
+        score=f"{correct_count}/{total}",
+        questions=_questions_data(quiz, user_answers, correct_flags, submitted=True),
     )
+    return state, correct_count, total
 
 
-def reset_quiz(state: QuizState) -> QuizState:
-    """Reset the quiz to its initial unsubmitted state."""
-    reset_questions = []
-    for q in state.questions:
-        reset_questions.append({
-            **q,
-            "userAnswer": "",
-            "isCorrect": False,
-            "options": [
-                {**opt, "disabled": False} for opt in q["options"]
-            ],
-        })
-    
+def reset_quiz(quiz: StoredQuiz) -> QuizState:
+    """Return the quiz in its initial unsubmitted state."""
+    total = len(quiz.ids)
     return QuizState(
-        title=state.title,
+        title=quiz.title,
         submitted=False,
         score=None,
-        questions=reset_questions,
+        questions=_questions_data(quiz, [""] * total, [False] * total, submitted=False),
     )
 
+
+# Fresh-state widgets keyed by the identity of their stored quiz. Each entry
+# holds on to its quiz, so the id can't be reused while the entry exists.
+_pristine_cache: LRUCache[int, tuple[StoredQuiz, WidgetRoot]] = LRUCache(maxsize=128)
+
+
+def build_pristine_quiz_widget(quiz: StoredQuiz) -> WidgetRoot:
+    """
+    Build the widget for the quiz in its initial unsubmitted state.
+
+    Stored quizzes are immutable, so the widget is built once per quiz and
+    later resets return it directly (treat as read-only).
+    """
+    cached = _pristine_cache.get(id(quiz))
+    if cached is not None:
+        return cached[1]
+    widget = build_quiz_widget(reset_quiz(quiz))
+    _pristine_cache[id(quiz)] = (quiz, widget)
+    return widget